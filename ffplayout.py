@@ -18,28 +18,38 @@
 
 # ------------------------------------------------------------------------------
 
+import atexit
+import bisect
 import configparser
-import glob
+import fnmatch
 import json
 import logging
 import math
 import os
 import random
 import re
+import selectors
 import signal
 import smtplib
 import socket
+import sqlite3
 import ssl
 import sys
 import time
 from argparse import ArgumentParser
-from datetime import date, datetime, timedelta
-from email.mime.multipart import MIMEMultipart
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from email.header import Header
 from email.mime.text import MIMEText
 from email.utils import formatdate
+from functools import lru_cache
+from http.client import HTTPException
+from itertools import accumulate
 from logging.handlers import TimedRotatingFileHandler
+from queue import Queue
 from subprocess import PIPE, CalledProcessError, Popen, check_output
-from threading import Thread
+from threading import Event, Lock, Thread
 from types import SimpleNamespace
 from urllib import request
 
@@ -48,11 +58,22 @@ try:
         import colorama
         colorama.init()
 
-    from watchdog.events import PatternMatchingEventHandler
+    from watchdog.events import FileSystemEventHandler
     from watchdog.observers import Observer
+    from watchdog.observers.polling import PollingObserver
 except ImportError:
     print('Some modules are not installed, ffplayout may or may not work')
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    json_loads = json.loads
+
+try:
+    import av
+except ImportError:
+    av = None
+
 
 # ------------------------------------------------------------------------------
 # argument parsing
@@ -110,32 +131,74 @@ def get_time(time_format):
         - stamp > current date time in seconds
         - else > current time in HH:MM:SS
     """
-    t = datetime.today()
-
     if time_format == 'full_sec':
-        return t.hour * 3600 + t.minute * 60 + t.second \
-             + t.microsecond / 1000000
+        t = time.time()
+        lt = time.localtime(t)
+        return lt.tm_hour * 3600 + lt.tm_min * 60 + lt.tm_sec + (t - int(t))
     elif time_format == 'stamp':
-        return float(datetime.now().timestamp())
+        return time.time()
     else:
-        return t.strftime('%H:%M:%S')
+        return time.strftime('%H:%M:%S', time.localtime())
 
 
 # ------------------------------------------------------------------------------
 # default variables and values
 # ------------------------------------------------------------------------------
 
-_general = SimpleNamespace()
-_mail = SimpleNamespace()
-_log = SimpleNamespace()
-_pre_comp = SimpleNamespace()
-_playlist = SimpleNamespace()
-_storage = SimpleNamespace()
-_text = SimpleNamespace()
-_playout = SimpleNamespace()
+# config values are read on every clip,
+# slots give faster attribute access than a namespace dict
+
+class _General:
+    __slots__ = ('stop', 'threshold')
+
+
+class _Mail:
+    __slots__ = ('subject', 'server', 'port', 's_addr', 's_pass', 'recip',
+                 'level')
+
+
+class _Log:
+    __slots__ = ('to_file', 'path', 'level', 'ff_level')
+
+
+class _PreComp:
+    __slots__ = ('w', 'h', 'aspect', 'fps', 'v_bitrate', 'v_bufsize',
+                 'add_logo', 'logo', 'opacity', 'logo_filter', 'logo_input',
+                 'logo_opacity', 'logo_overlay', 'dummy_color',
+                 'add_loudnorm', 'loud_i', 'loud_tp', 'loud_lra', 'loudnorm')
+
+
+class _Playlist:
+    __slots__ = ('mode', 'path', 'start', 'length', 'target')
+
+
+class _Storage:
+    __slots__ = ('path', 'filler', 'extensions', 'shuffle', 'probe_cache')
+
+
+class _Text:
+    __slots__ = ('add_text', 'textfile', 'fontsize', 'fontcolor', 'fontfile',
+                 'box', 'boxcolor', 'boxborderw', 'x', 'y')
+
+
+class _Playout:
+    __slots__ = ('preview', 'name', 'provider', 'out_addr', 'post_comp_video',
+                 'post_comp_audio', 'post_comp_extra')
+
+
+_general = _General()
+_mail = _Mail()
+_log = _Log()
+_pre_comp = _PreComp()
+_playlist = _Playlist()
+_storage = _Storage()
+_text = _Text()
+_playout = _Playout()
 
 _init = SimpleNamespace(load=True)
-_ff = SimpleNamespace(decoder=None, encoder=None)
+_cfg_cache = {'mtime': None, 'flat': None}
+_ff = SimpleNamespace(decoder=None, encoder=None,
+                      dec_alive=False, enc_alive=False)
 
 _WINDOWS = os.name == 'nt'
 COPY_BUFSIZE = 1024 * 1024 if _WINDOWS else 64 * 1024
@@ -147,8 +210,6 @@ def load_config():
     the change does not take effect immediately, but with the after next file,
     some settings cannot be changed - like resolution, aspect, or output
     """
-    cfg = configparser.ConfigParser()
-
     def str_to_sec(s):
         if s in ['now', '', None, 'none']:
             return None
@@ -160,17 +221,36 @@ def load_config():
                 print('Wrong time format!')
                 sys.exit(1)
 
+    def to_bool(s):
+        return configparser.ConfigParser.BOOLEAN_STATES[s.lower()]
+
     if stdin_args.config:
-        cfg.read(stdin_args.config)
+        cfg_path = stdin_args.config
     elif os.path.isfile('/etc/ffplayout/ffplayout.conf'):
-        cfg.read('/etc/ffplayout/ffplayout.conf')
+        cfg_path = '/etc/ffplayout/ffplayout.conf'
     else:
-        cfg.read('ffplayout.conf')
+        cfg_path = 'ffplayout.conf'
+
+    try:
+        mtime = os.stat(cfg_path).st_mtime_ns
+    except OSError:
+        mtime = None
+
+    # parse config only when file has changed since last load
+    if mtime is None or mtime != _cfg_cache['mtime']:
+        parser = configparser.ConfigParser()
+        parser.read(cfg_path)
+        _cfg_cache['flat'] = {
+            (section, key): value for section in parser.sections()
+            for key, value in parser.items(section)}
+        _cfg_cache['mtime'] = mtime
+
+    cfg = _cfg_cache['flat']
 
     if stdin_args.start:
         p_start = str_to_sec(stdin_args.start)
     else:
-        p_start = str_to_sec(cfg.get('PLAYLIST', 'day_start'))
+        p_start = str_to_sec(cfg['PLAYLIST', 'day_start'])
 
     if not p_start:
         p_start = get_time('full_sec')
@@ -178,72 +258,89 @@ def load_config():
     if stdin_args.length:
         p_length = str_to_sec(stdin_args.length)
     else:
-        p_length = str_to_sec(cfg.get('PLAYLIST', 'length'))
-
-    _general.stop = cfg.getboolean('GENERAL', 'stop_on_error')
-    _general.threshold = cfg.getfloat('GENERAL', 'stop_threshold')
-
-    _mail.subject = cfg.get('MAIL', 'subject')
-    _mail.server = cfg.get('MAIL', 'smpt_server')
-    _mail.port = cfg.getint('MAIL', 'smpt_port')
-    _mail.s_addr = cfg.get('MAIL', 'sender_addr')
-    _mail.s_pass = cfg.get('MAIL', 'sender_pass')
-    _mail.recip = cfg.get('MAIL', 'recipient')
-    _mail.level = cfg.get('MAIL', 'mail_level')
-
-    _pre_comp.add_logo = cfg.getboolean('PRE_COMPRESS', 'add_logo')
-    _pre_comp.logo = cfg.get('PRE_COMPRESS', 'logo')
-    _pre_comp.opacity = cfg.get('PRE_COMPRESS', 'logo_opacity')
-    _pre_comp.logo_filter = cfg.get('PRE_COMPRESS', 'logo_filter')
-    _pre_comp.add_loudnorm = cfg.getboolean('PRE_COMPRESS', 'add_loudnorm')
-    _pre_comp.loud_i = cfg.getfloat('PRE_COMPRESS', 'loud_I')
-    _pre_comp.loud_tp = cfg.getfloat('PRE_COMPRESS', 'loud_TP')
-    _pre_comp.loud_lra = cfg.getfloat('PRE_COMPRESS', 'loud_LRA')
-
-    _playlist.mode = cfg.getboolean('PLAYLIST', 'playlist_mode')
-    _playlist.path = cfg.get('PLAYLIST', 'path')
+        p_length = str_to_sec(cfg['PLAYLIST', 'length'])
+
+    _general.stop = to_bool(cfg['GENERAL', 'stop_on_error'])
+    _general.threshold = float(cfg['GENERAL', 'stop_threshold'])
+
+    _mail.subject = cfg['MAIL', 'subject']
+    _mail.server = cfg['MAIL', 'smpt_server']
+    _mail.port = int(cfg['MAIL', 'smpt_port'])
+    _mail.s_addr = cfg['MAIL', 'sender_addr']
+    _mail.s_pass = cfg['MAIL', 'sender_pass']
+    _mail.recip = cfg['MAIL', 'recipient']
+    _mail.level = cfg['MAIL', 'mail_level']
+
+    _pre_comp.add_logo = to_bool(cfg['PRE_COMPRESS', 'add_logo'])
+    _pre_comp.logo = cfg['PRE_COMPRESS', 'logo']
+    _pre_comp.opacity = cfg['PRE_COMPRESS', 'logo_opacity']
+    _pre_comp.logo_filter = cfg['PRE_COMPRESS', 'logo_filter']
+    _pre_comp.add_loudnorm = to_bool(cfg['PRE_COMPRESS', 'add_loudnorm'])
+    _pre_comp.loud_i = float(cfg['PRE_COMPRESS', 'loud_i'])
+    _pre_comp.loud_tp = float(cfg['PRE_COMPRESS', 'loud_tp'])
+    _pre_comp.loud_lra = float(cfg['PRE_COMPRESS', 'loud_lra'])
+    _pre_comp.loudnorm = 'loudnorm=I={}:TP={}:LRA={}'.format(
+        _pre_comp.loud_i, _pre_comp.loud_tp, _pre_comp.loud_lra)
+
+    # static parts from logo filter
+    _pre_comp.logo_input = 'movie={}'.format(_pre_comp.logo)
+    _pre_comp.logo_opacity = 'format=rgba,colorchannelmixer=aa={}'.format(
+        _pre_comp.opacity)
+    _pre_comp.logo_overlay = '[l];[v][l]{}[logo]'.format(
+        _pre_comp.logo_filter)
+
+    _playlist.mode = to_bool(cfg['PLAYLIST', 'playlist_mode'])
+    _playlist.path = cfg['PLAYLIST', 'path']
     _playlist.start = p_start
     _playlist.length = p_length
-
-    _storage.path = cfg.get('STORAGE', 'path')
-    _storage.filler = cfg.get('STORAGE', 'filler_clip')
-    _storage.extensions = json.loads(cfg.get('STORAGE', 'extensions'))
-    _storage.shuffle = cfg.getboolean('STORAGE', 'shuffle')
-
-    _text.add_text = cfg.getboolean('TEXT', 'add_text')
-    _text.textfile = cfg.get('TEXT', 'textfile')
-    _text.fontsize = cfg.get('TEXT', 'fontsize')
-    _text.fontcolor = cfg.get('TEXT', 'fontcolor')
-    _text.fontfile = cfg.get('TEXT', 'fontfile')
-    _text.box = cfg.get('TEXT', 'box')
-    _text.boxcolor = cfg.get('TEXT', 'boxcolor')
-    _text.boxborderw = cfg.get('TEXT', 'boxborderw')
-    _text.x = cfg.get('TEXT', 'x')
-    _text.y = cfg.get('TEXT', 'y')
+    _playlist.target = p_length if p_length else 86400.0
+
+    _storage.path = cfg['STORAGE', 'path']
+    _storage.filler = cfg['STORAGE', 'filler_clip']
+    _storage.extensions = json.loads(cfg['STORAGE', 'extensions'])
+    _storage.shuffle = to_bool(cfg['STORAGE', 'shuffle'])
+    # optional, older config files don't have it
+    _storage.probe_cache = cfg.get(('STORAGE', 'probe_cache'), '')
+
+    _text.add_text = to_bool(cfg['TEXT', 'add_text'])
+    _text.textfile = cfg['TEXT', 'textfile']
+    _text.fontsize = cfg['TEXT', 'fontsize']
+    _text.fontcolor = cfg['TEXT', 'fontcolor']
+    _text.fontfile = cfg['TEXT', 'fontfile']
+    _text.box = cfg['TEXT', 'box']
+    _text.boxcolor = cfg['TEXT', 'boxcolor']
+    _text.boxborderw = cfg['TEXT', 'boxborderw']
+    _text.x = cfg['TEXT', 'x']
+    _text.y = cfg['TEXT', 'y']
 
     if _init.load:
-        _log.to_file = cfg.getboolean('LOGGING', 'log_to_file')
-        _log.path = cfg.get('LOGGING', 'log_path')
-        _log.level = cfg.get('LOGGING', 'log_level')
-        _log.ff_level = cfg.get('LOGGING', 'ffmpeg_level')
-
-        _pre_comp.w = cfg.getint('PRE_COMPRESS', 'width')
-        _pre_comp.h = cfg.getint('PRE_COMPRESS', 'height')
-        _pre_comp.aspect = cfg.getfloat('PRE_COMPRESS', 'aspect')
-        _pre_comp.fps = cfg.getint('PRE_COMPRESS', 'fps')
-        _pre_comp.v_bitrate = cfg.getint('PRE_COMPRESS', 'width') * 50
-        _pre_comp.v_bufsize = cfg.getint('PRE_COMPRESS', 'width') * 50 / 2
-
-        _playout.preview = cfg.getboolean('OUT', 'preview')
-        _playout.name = cfg.get('OUT', 'service_name')
-        _playout.provider = cfg.get('OUT', 'service_provider')
-        _playout.out_addr = cfg.get('OUT', 'out_addr')
+        _log.to_file = to_bool(cfg['LOGGING', 'log_to_file'])
+        _log.path = cfg['LOGGING', 'log_path']
+        _log.level = cfg['LOGGING', 'log_level']
+        _log.ff_level = cfg['LOGGING', 'ffmpeg_level'].upper()
+
+        _pre_comp.w = int(cfg['PRE_COMPRESS', 'width'])
+        _pre_comp.h = int(cfg['PRE_COMPRESS', 'height'])
+        _pre_comp.aspect = float(cfg['PRE_COMPRESS', 'aspect'])
+        _pre_comp.fps = int(cfg['PRE_COMPRESS', 'fps'])
+        _pre_comp.v_bitrate = int(cfg['PRE_COMPRESS', 'width']) * 50
+        _pre_comp.v_bufsize = int(cfg['PRE_COMPRESS', 'width']) * 50 / 2
+
+        # dummy clip template, only duration needs to be filled in
+        _pre_comp.dummy_color = ('color=c=#121212:s={}x{}:d={{}}:r={},'
+                                 'format=pix_fmts=yuv420p').format(
+                                     _pre_comp.w, _pre_comp.h, _pre_comp.fps)
+
+        _playout.preview = to_bool(cfg['OUT', 'preview'])
+        _playout.name = cfg['OUT', 'service_name']
+        _playout.provider = cfg['OUT', 'service_provider']
+        _playout.out_addr = cfg['OUT', 'out_addr']
         _playout.post_comp_video = json.loads(
-            cfg.get('OUT', 'post_comp_video'))
+            cfg['OUT', 'post_comp_video'])
         _playout.post_comp_audio = json.loads(
-            cfg.get('OUT', 'post_comp_audio'))
+            cfg['OUT', 'post_comp_audio'])
         _playout.post_comp_extra = json.loads(
-            cfg.get('OUT', 'post_comp_extra'))
+            cfg['OUT', 'post_comp_extra'])
 
         _init.load = False
 
@@ -275,35 +372,62 @@ class CustomFormatter(logging.Formatter):
     message = grey + '  %(message)s' + reset
 
     FORMATS = {
-        logging.DEBUG: timestamp + blue + level + '  ' + message + reset,
-        logging.INFO: timestamp + green + level + '   ' + message + reset,
-        logging.WARNING: timestamp + yellow + level + message + reset,
-        logging.ERROR: timestamp + red + level + '  ' + message + reset
+        logging.DEBUG: logging.Formatter(
+            timestamp + blue + level + '  ' + message + reset),
+        logging.INFO: logging.Formatter(
+            timestamp + green + level + '   ' + message + reset),
+        logging.WARNING: logging.Formatter(
+            timestamp + yellow + level + message + reset),
+        logging.ERROR: logging.Formatter(
+            timestamp + red + level + '  ' + message + reset)
     }
+    default = logging.Formatter()
+
+    re_quoted = re.compile('(".*?")')
+    re_decoder = re.compile(r'(\[decoder\])')
+    re_encoder = re.compile(r'(\[encoder\])')
+    re_path = re.compile(r'(["\w.:/]+/|["\w.:]+\\.*?)')
+    re_digit = re.compile(r'\d')
+    re_number = re.compile('([0-9.:-]+)')
+
+    sub_quoted = cyan + r'\1' + reset
+    sub_prefix = reset + r'\1'
+    sub_path = magenta + r'\1'
+    sub_number = yellow + r'\1' + reset
 
     def format_message(self, msg):
         if '"' in msg and '[' in msg:
-            msg = re.sub('(".*?")', self.cyan + r'\1' + self.reset, msg)
+            msg = self.re_quoted.sub(self.sub_quoted, msg)
         elif '[decoder]' in msg:
-            msg = re.sub(r'(\[decoder\])', self.reset + r'\1', msg)
+            msg = self.re_decoder.sub(self.sub_prefix, msg)
         elif '[encoder]' in msg:
-            msg = re.sub(r'(\[encoder\])', self.reset + r'\1', msg)
+            msg = self.re_encoder.sub(self.sub_prefix, msg)
         elif '/' in msg or '\\' in msg:
-            msg = re.sub(
-                r'(["\w.:/]+/|["\w.:]+\\.*?)', self.magenta + r'\1', msg)
-        elif re.search(r'\d', msg):
-            msg = re.sub(
-                '([0-9.:-]+)', self.yellow + r'\1' + self.reset, msg)
+            msg = self.re_path.sub(self.sub_path, msg)
+        elif self.re_digit.search(msg):
+            msg = self.re_number.sub(self.sub_number, msg)
 
         return msg
 
     def format(self, record):
         record.msg = self.format_message(record.getMessage())
-        log_fmt = self.FORMATS.get(record.levelno)
-        formatter = logging.Formatter(log_fmt)
+        formatter = self.FORMATS.get(record.levelno, self.default)
         return formatter.format(record)
 
 
+def ffmpeg_log_level():
+    """
+    logging level for ffmpeg messages,
+    all levels others then INFO and WARNING are logged as error
+    """
+    if _log.ff_level == 'INFO':
+        return logging.INFO
+    elif _log.ff_level == 'WARNING':
+        return logging.WARNING
+    else:
+        return logging.ERROR
+
+
 # If the log file is specified on the command line then override the default
 if stdin_args.log:
     _log.path = stdin_args.log
@@ -311,9 +435,9 @@ if stdin_args.log:
 playout_logger = logging.getLogger('playout')
 playout_logger.setLevel(_log.level)
 decoder_logger = logging.getLogger('decoder')
-decoder_logger.setLevel(_log.ff_level)
+decoder_logger.setLevel(ffmpeg_log_level())
 encoder_logger = logging.getLogger('encoder')
-encoder_logger.setLevel(_log.ff_level)
+encoder_logger.setLevel(ffmpeg_log_level())
 
 if _log.to_file and _log.path != 'none':
     if _log.path and os.path.isdir(_log.path):
@@ -364,40 +488,82 @@ class Mailer:
 
     def __init__(self):
         self.level = _mail.level
-        self.time = None
+        self.server = None
+        self.queue = Queue()
 
-    def current_time(self):
-        self.time = get_time(None)
+        # mails are send from own thread, so playout never waits for smtp
+        sender = Thread(name='mailer', target=self.process_queue)
+        sender.daemon = True
+        sender.start()
 
-    def send_mail(self, msg):
-        if _mail.recip:
-            self.current_time()
+        atexit.register(self.flush)
+
+    def connect(self):
+        try:
+            server = smtplib.SMTP(_mail.server, _mail.port)
+        except socket.error as err:
+            playout_logger.error(err)
+            return None
+
+        server.starttls()
+        try:
+            server.login(_mail.s_addr, _mail.s_pass)
+        except smtplib.SMTPAuthenticationError as serr:
+            playout_logger.error(serr)
+            server.quit()
+            return None
+
+        return server
+
+    def send(self, stamp, msg):
+        # keep connection open, for sending the next mails
+        if self.server is None:
+            self.server = self.connect()
+
+        if self.server is None:
+            return
 
-            message = MIMEMultipart()
-            message['From'] = _mail.s_addr
-            message['To'] = _mail.recip
-            message['Subject'] = _mail.subject
-            message['Date'] = formatdate(localtime=True)
-            message.attach(MIMEText('{} {}'.format(self.time, msg), 'plain'))
-            text = message.as_string()
+        message = MIMEText('{} {}'.format(
+            time.strftime('%H:%M:%S', time.localtime(stamp)), msg),
+            'plain', 'utf-8')
+        message['From'] = _mail.s_addr
+        message['To'] = _mail.recip
+        message['Subject'] = Header(_mail.subject, 'utf-8')
+        message['Date'] = formatdate(stamp, localtime=True)
+
+        # message is pure ascii now, smtplib fixes the line endings
+        self.server.sendmail(_mail.s_addr, _mail.recip, message.as_string())
+
+    def process_queue(self):
+        while True:
+            stamp, msg = self.queue.get()
 
             try:
-                server = smtplib.SMTP(_mail.server, _mail.port)
-            except socket.error as err:
+                self.send(stamp, msg)
+            except smtplib.SMTPServerDisconnected:
+                # server has closed the idle connection, open a new one
+                self.server = None
+                try:
+                    self.send(stamp, msg)
+                except (smtplib.SMTPException, socket.error) as err:
+                    playout_logger.error(err)
+                    self.server = None
+            except (smtplib.SMTPException, socket.error) as err:
                 playout_logger.error(err)
-                server = None
+                self.server = None
 
-            if server is not None:
-                server.starttls()
-                try:
-                    login = server.login(_mail.s_addr, _mail.s_pass)
-                except smtplib.SMTPAuthenticationError as serr:
-                    playout_logger.error(serr)
-                    login = None
+            self.queue.task_done()
+
+    def flush(self, timeout=10):
+        # give pending mails some time to be send before exit
+        end = time.monotonic() + timeout
+
+        while self.queue.unfinished_tasks and time.monotonic() < end:
+            time.sleep(0.1)
 
-                if login is not None:
-                    server.sendmail(_mail.s_addr, _mail.recip, text)
-                    server.quit()
+    def send_mail(self, msg):
+        if _mail.recip:
+            self.queue.put((get_time('stamp'), msg))
 
     def info(self, msg):
         if self.level in ['INFO']:
@@ -421,8 +587,13 @@ class Messenger:
     def __init__(self):
         self._mailer = Mailer()
 
-    def debug(self, msg):
-        playout_logger.debug(msg.replace('\n', ' '))
+    def debug(self, msg, *args):
+        # format message only, when debug level is active
+        if playout_logger.isEnabledFor(logging.DEBUG):
+            if args:
+                msg = msg.format(*args)
+
+            playout_logger.debug(msg.replace('\n', ' '))
 
     def info(self, msg):
         playout_logger.info(msg.replace('\n', ' '))
@@ -478,19 +649,158 @@ FF_LIBS = ffmpeg_libs()
 # probe media infos
 # ------------------------------------------------------------------------------
 
+_probe_cache = OrderedDict()
+PROBE_CACHE_SIZE = 4096
+
+
+_probe_db = {'db': None, 'opened': False}
+_probe_db_lock = Lock()
+
+
+def open_probe_db():
+    """
+    open the persistent probe cache on first use,
+    without usable database only the memory cache is used
+    """
+    if not _probe_db['opened']:
+        _probe_db['opened'] = True
+
+        if not _storage.probe_cache:
+            return None
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(
+                _storage.probe_cache)), exist_ok=True)
+            db = sqlite3.connect(_storage.probe_cache, isolation_level=None,
+                                 check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute('CREATE TABLE IF NOT EXISTS probe (path TEXT PRIMARY '
+                       'KEY, mtime INTEGER, size INTEGER, data BLOB)')
+            _probe_db['db'] = db
+        except (OSError, sqlite3.Error) as err:
+            messenger.warning('Probe cache "{}" is not usable:\n{}'.format(
+                _storage.probe_cache, err))
+
+    return _probe_db['db']
+
+
+def probe_db_get(key):
+    try:
+        with _probe_db_lock:
+            db = open_probe_db()
+
+            if db is None:
+                return None
+
+            row = db.execute(
+                'SELECT data FROM probe WHERE path=? AND mtime=? AND size=?',
+                key).fetchone()
+    except sqlite3.Error:
+        return None
+
+    return row[0] if row else None
+
+
+def probe_db_set(key, data):
+    try:
+        with _probe_db_lock:
+            db = open_probe_db()
+
+            if db is not None:
+                db.execute('INSERT OR REPLACE INTO probe VALUES (?, ?, ?, ?)',
+                           (*key, data))
+    except sqlite3.Error:
+        pass
+
+
+FIELD_ORDER = {1: 'progressive', 2: 'tt', 3: 'bb', 4: 'tb', 5: 'bt'}
+
+
+def av_probe(src):
+    """
+    read media infos in process with PyAV,
+    in the same structure ffprobe's json output has
+    """
+    def rate(value):
+        if not value:
+            return '0/1'
+
+        return '{}/{}'.format(value.numerator, value.denominator)
+
+    info = {'format': {}, 'streams': []}
+
+    with av.open(src, metadata_errors='ignore') as container:
+        info['format']['format_name'] = container.format.name
+
+        if container.duration is not None:
+            info['format']['duration'] = str(
+                container.duration / av.time_base)
+
+        for stream in container.streams:
+            # streams without decoder, like timecode or data, have no codec
+            codec = stream.codec_context
+            node = {'index': stream.index, 'codec_type': stream.type,
+                    'codec_name': codec.name if codec else None}
+
+            if stream.duration is not None:
+                node['duration'] = str(
+                    float(stream.duration * stream.time_base))
+
+            if stream.type == 'video':
+                if codec is None:
+                    # no video infos without decoder, ffprobe has them
+                    raise ValueError(
+                        'No decoder for stream {}'.format(stream.index))
+
+                node['width'] = codec.width
+                node['height'] = codec.height
+                node['pix_fmt'] = codec.format.name if codec.format else None
+                node['r_frame_rate'] = rate(
+                    stream.base_rate or stream.average_rate)
+
+                if stream.display_aspect_ratio:
+                    node['display_aspect_ratio'] = rate(
+                        stream.display_aspect_ratio).replace('/', ':')
+
+                # without field order interlaced sources would lose
+                # deinterlacing, ffprobe knows it in that case
+                field_order = getattr(codec, 'field_order', None)
+
+                if field_order not in FIELD_ORDER:
+                    raise ValueError(
+                        'Unknown field order in stream {}'.format(
+                            stream.index))
+
+                node['field_order'] = FIELD_ORDER[field_order]
+
+            elif stream.type == 'audio' and codec is not None:
+                node['sample_rate'] = str(codec.sample_rate)
+                node['channels'] = codec.channels
+
+            info['streams'].append(node)
+
+    return info
+
+
 class MediaProbe:
     """
-    get infos about media file, similare to mediainfo
+    get infos about media file, similare to mediainfo,
+    results from local files are cached by path, mtime and size,
+    in memory and when configured in a sqlite database,
+    local files are read with PyAV, when it is installed
     """
 
-    def load(self, file):
-        self.remote_source = ['http', 'https', 'ftp', 'smb', 'sftp']
+    remote_source = frozenset(['http', 'https', 'ftp', 'smb', 'sftp'])
+
+    def load(self, file, quiet=False):
         self.src = file
         self.format = None
         self.audio = []
         self.video = []
+        cache_key = None
 
-        if self.src and self.src.split('://')[0] in self.remote_source:
+        if self.src and self.src.split('://', 1)[0] in self.remote_source:
             self.is_remote = True
         else:
             self.is_remote = False
@@ -501,18 +811,50 @@ class MediaProbe:
 
                 return
 
-        cmd = ['ffprobe', '-v', 'quiet', '-print_format',
-               'json', '-show_format', '-show_streams', self.src]
+            stat = os.stat(self.src)
+            cache_key = (self.src, stat.st_mtime_ns, stat.st_size)
 
-        try:
-            info = json.loads(check_output(cmd).decode('UTF-8'))
-        except CalledProcessError as err:
-            messenger.error('MediaProbe error in: "{}"\n {}'.format(self.src,
-                                                                    err))
-            self.audio.append(None)
-            self.video.append(None)
+            if cache_key in _probe_cache:
+                _probe_cache.move_to_end(cache_key)
+                self.format, audio, video = _probe_cache[cache_key]
+                self.audio = list(audio)
+                self.video = list(video)
 
-            return
+                return
+
+        data = probe_db_get(cache_key) if cache_key else None
+
+        if data is not None:
+            info = json_loads(data)
+        else:
+            cmd = ['ffprobe', '-v', 'quiet', '-print_format',
+                   'json', '-show_format', '-show_streams', self.src]
+
+            info = None
+
+            if av and not self.is_remote:
+                try:
+                    info = av_probe(self.src)
+                    data = json.dumps(info)
+                except Exception:
+                    # let ffprobe try it, it also reports the error
+                    info = None
+
+            try:
+                if info is None:
+                    data = check_output(cmd)
+                    info = json_loads(data)
+            except CalledProcessError as err:
+                if not quiet:
+                    messenger.error('MediaProbe error in: "{}"\n {}'.format(
+                        self.src, err))
+                self.audio.append(None)
+                self.video.append(None)
+
+                return
+
+            if cache_key:
+                probe_db_set(cache_key, data)
 
         self.format = info['format']
 
@@ -533,6 +875,14 @@ class MediaProbe:
 
                 self.video.append(stream)
 
+        if cache_key:
+            _probe_cache[cache_key] = (
+                self.format, list(self.audio), list(self.video))
+
+            # drop least recently used entries
+            while len(_probe_cache) > PROBE_CACHE_SIZE:
+                _probe_cache.popitem(last=False)
+
 
 # ------------------------------------------------------------------------------
 # global helper functions
@@ -540,9 +890,10 @@ class MediaProbe:
 
 def handle_sigterm(sig, frame):
     """
-    handler for ctrl+c signal
+    handler for ctrl+c signal,
+    running processes get terminated by the exit handler
     """
-    raise(SystemExit)
+    sys.exit()
 
 
 def handle_sighub(sig, frame):
@@ -562,46 +913,133 @@ if os.name == 'posix':
 
 def terminate_processes(watcher=None):
     """
-    kill orphaned processes
+    kill orphaned processes,
+    dec_alive and enc_alive are cleared when a process is known to be stopped
     """
-    if _ff.decoder and _ff.decoder.poll() is None:
+    if _ff.decoder and _ff.dec_alive:
+        _ff.dec_alive = False
         _ff.decoder.terminate()
 
-    if _ff.encoder and _ff.encoder.poll() is None:
+    if _ff.encoder and _ff.enc_alive:
+        _ff.enc_alive = False
         _ff.encoder.terminate()
 
     if watcher:
         watcher.stop()
 
 
+atexit.register(terminate_processes)
+
+
 def ffmpeg_stderr_reader(std_errors, logger, prefix):
+    level = ffmpeg_log_level()
+
     try:
         for line in std_errors:
-            if _log.ff_level == 'INFO':
-                logger.info('{}{}'.format(
-                    prefix, line.decode("utf-8").rstrip()))
-            elif _log.ff_level == 'WARNING':
-                logger.warning('{}{}'.format(
-                    prefix, line.decode("utf-8").rstrip()))
-            else:
-                logger.error('{}{}'.format(
-                    prefix, line.decode("utf-8").rstrip()))
+            line = line.decode("utf-8").rstrip()
+
+            if line:
+                logger.log(level, '{}{}'.format(prefix, line))
     except ValueError:
         pass
 
 
+class StderrReader:
+    """
+    read stderr from all ffmpeg processes in one thread,
+    pipes can not be selected on windows, there every process get its thread
+    """
+
+    def __init__(self):
+        self.level = ffmpeg_log_level()
+        self.selector = None
+
+        if not _WINDOWS:
+            self.selector = selectors.DefaultSelector()
+            reader = Thread(name='stderr_reader', target=self.read)
+            reader.daemon = True
+            reader.start()
+
+    def add(self, std_errors, logger, prefix):
+        if self.selector is None:
+            reader = Thread(target=ffmpeg_stderr_reader,
+                            args=(std_errors, logger, prefix))
+            reader.daemon = True
+            reader.start()
+        else:
+            # use own file descriptor, the process closes its pipe on exit
+            self.selector.register(os.dup(std_errors.fileno()),
+                                   selectors.EVENT_READ, [logger, prefix, b''])
+
+    def read(self):
+        while True:
+            for key, _ in self.selector.select(timeout=1):
+                # this thread must not stop, otherwise the stderr pipes
+                # fill up and ffmpeg blocks
+                try:
+                    self.read_lines(key)
+                except Exception as err:
+                    playout_logger.error(
+                        'Reading ffmpeg messages failed: {}'.format(err))
+
+    def read_lines(self, key):
+        logger, prefix, rest = key.data
+
+        try:
+            chunk = os.read(key.fd, COPY_BUFSIZE)
+        except OSError:
+            chunk = b''
+
+        if chunk:
+            lines = (rest + chunk).split(b'\n')
+            # keep incomplete line for next read
+            key.data[2] = lines.pop()
+        else:
+            # pipe is closed or broken
+            lines = [rest]
+            self.selector.unregister(key.fd)
+            os.close(key.fd)
+
+        for line in lines:
+            line = line.decode('utf-8', 'replace').rstrip()
+
+            if line:
+                logger.log(self.level, '{}{}'.format(prefix, line))
+
+
+_date_cache = {'until': 0.0, 'start': None, 'dates': (None, None)}
+
+
 def get_date(seek_day):
     """
     get date for correct playlist,
     when seek_day is set:
-    check if playlist date must be from yesterday
-    """
-    d = date.today()
-    if seek_day and get_time('full_sec') < _playlist.start:
-        yesterday = d - timedelta(1)
-        return yesterday.strftime('%Y-%m-%d')
-    else:
-        return d.strftime('%Y-%m-%d')
+    check if playlist date must be from yesterday,
+    the dates are cached until the next day start or midnight
+    """
+    now = time.time()
+
+    if now >= _date_cache['until'] or _date_cache['start'] != _playlist.start:
+        t = time.localtime(now)
+        today = date(t.tm_year, t.tm_mon, t.tm_mday)
+        # mktime normalizes the overflowing seconds and days
+        day_start = time.mktime(
+            t[:3] + (0, 0, int(_playlist.start), 0, 0, -1)
+            ) + _playlist.start % 1
+
+        if now < day_start:
+            seek_date = today - timedelta(1)
+            until = day_start
+        else:
+            seek_date = today
+            until = time.mktime(t[:2] + (t.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+
+        _date_cache['until'] = until
+        _date_cache['start'] = _playlist.start
+        _date_cache['dates'] = (today.strftime('%Y-%m-%d'),
+                                seek_date.strftime('%Y-%m-%d'))
+
+    return _date_cache['dates'][1 if seek_day else 0]
 
 
 def is_float(value):
@@ -626,18 +1064,78 @@ def is_int(value):
         return False
 
 
+def scan_folder(folder):
+    """
+    walk recursive through folder and yield all files,
+    os.scandir gets the file type without extra stat calls,
+    hidden files and folders are skipped, like glob does
+    """
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                elif entry.is_dir():
+                    yield from scan_folder(entry.path)
+                elif entry.is_file():
+                    yield entry
+    except OSError:
+        return
+
+
+def storage_index():
+    """
+    list all files from storage path, with one walk,
+    instead of testing every playlist source on its own
+    """
+    return {entry.path for entry in scan_folder(_storage.path)}
+
+
 def valid_json(file):
     """
     simple json validation
     """
     try:
-        json_object = json.load(file)
+        json_object = json_loads(file.read())
         return json_object
     except ValueError:
         messenger.error("Playlist {} is not JSON conform".format(file))
         return None
 
 
+Clip = namedtuple('Clip', ['source', 'seek', 'out', 'duration', 'category'])
+
+
+def playlist_clips(json_nodes):
+    """
+    convert playlist nodes to clip tuples,
+    wrong or missing time values get there default
+    """
+    if json_nodes is None:
+        return None
+
+    clips = []
+
+    for node in json_nodes["program"]:
+        seek = node.get("in")
+        duration = node.get("duration")
+        out = node.get("out")
+
+        if not is_float(seek):
+            seek = 0
+
+        if not is_float(duration):
+            duration = 20
+
+        if not is_float(out):
+            out = duration
+
+        clips.append(Clip(node.get("source"), seek, out, duration,
+                          node.get("category")))
+
+    return clips
+
+
 def check_sync(delta):
     """
     check that we are in tolerance time
@@ -646,7 +1144,6 @@ def check_sync(delta):
         messenger.error(
             'Sync tolerance value exceeded with {0:.2f} seconds,\n'
             'program terminated!'.format(delta))
-        terminate_processes()
         sys.exit(1)
 
 
@@ -670,21 +1167,60 @@ def validate_thread(clip_nodes):
     validate json values in new thread
     and test if source paths exist
     """
+    def is_remote(source):
+        return source.split('://', 1)[0] in MediaProbe.remote_source
+
+    def stream_exists(source):
+        # http sources only need to be reachable here,
+        # a HEAD request is much cheaper then starting ffprobe
+        if source.split('://', 1)[0] in ('http', 'https'):
+            try:
+                request.urlopen(request.Request(source, method='HEAD'),
+                                timeout=1,
+                                context=ssl._create_unverified_context())
+
+                return True
+            except request.HTTPError as err:
+                # server don't allow HEAD, probe it instead
+                if err.code not in (405, 501):
+                    return False
+            except (request.URLError, socket.timeout, ValueError):
+                return False
+            except (OSError, HTTPException):
+                # server answers not in plain http, like icecast does,
+                # let ffprobe check it
+                pass
+
+        probe = MediaProbe()
+        probe.load(source)
+
+        return bool(probe.video and probe.video[0])
+
     def check_json(json_nodes):
         error = ''
         counter = 0
-        probe = MediaProbe()
+
+        # list storage once per playlist load
+        index = storage_index()
+
+        # remote sources are probed in parallel, with threads instead of
+        # asyncio subprocesses, which need python 3.8+ outside the main thread
+        streams = [node["source"] for node in json_nodes["program"]
+                   if is_remote(node["source"])]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            streams = dict(zip(streams, executor.map(stream_exists, streams)))
 
         # check if all values are valid
         for node in json_nodes["program"]:
             source = node["source"]
-            probe.load(source)
             missing = []
 
-            if probe.is_remote:
-                if not probe.video[0]:
+            if source in streams:
+                if not streams[source]:
                     missing.append('Stream not exist: "{}"'.format(source))
-            elif not os.path.isfile(source):
+            elif source not in index and \
+                    not os.path.isfile(source):
                 missing.append('File not exist: "{}"'.format(source))
 
             if is_float(node["in"]) and is_float(node["out"]):
@@ -717,9 +1253,9 @@ def seek_in(seek):
     seek in clip
     """
     if seek > 0.0:
-        return ['-ss', str(seek)]
+        return ('-ss', '{:.3f}'.format(seek))
     else:
-        return []
+        return ()
 
 
 def set_length(duration, seek, out):
@@ -727,9 +1263,9 @@ def set_length(duration, seek, out):
     set new clip length
     """
     if out < duration:
-        return ['-t', str(out - seek)]
+        return ('-t', '{:.3f}'.format(out - seek))
     else:
-        return []
+        return ()
 
 
 def loop_input(source, src_duration, target_duration):
@@ -746,14 +1282,10 @@ def gen_dummy(duration):
     """
     generate a dummy clip, with black color and empty audiotrack
     """
-    color = '#121212'
     # IDEA: add noise could be an config option
     # noise = 'noise=alls=50:allf=t+u,hue=s=0'
     return [
-        '-f', 'lavfi', '-i',
-        'color=c={}:s={}x{}:d={}:r={},format=pix_fmts=yuv420p'.format(
-            color, _pre_comp.w, _pre_comp.h, duration, _pre_comp.fps
-        ),
+        '-f', 'lavfi', '-i', _pre_comp.dummy_color.format(duration),
         '-f', 'lavfi', '-i', 'anoisesrc=d={}:c=pink:r=48000:a=0.05'.format(
             duration)
     ]
@@ -773,8 +1305,8 @@ def gen_filler(duration):
                 # cut filler
                 messenger.info(
                     'Generate filler with {0:.2f} seconds'.format(duration))
-                return probe, ['-i', _storage.filler] + set_length(
-                    filler_duration, 0, duration)
+                return probe, ['-i', _storage.filler, *set_length(
+                    filler_duration, 0, duration)]
             else:
                 # loop file n times
                 return probe, loop_input(_storage.filler,
@@ -800,19 +1332,20 @@ def src_or_dummy(probe, src, dur, seek, out):
         if seek > 0.0:
             messenger.warning(
                 'Seek in live source "{}" not supported!'.format(src))
-        return ['-i', src] + set_length(86400.0, seek, out)
+        return ['-i', src, *set_length(86400.0, seek, out)]
     elif src and os.path.isfile(src):
         if out > dur:
             if seek > 0.0:
                 messenger.warning(
                     'Seek in looped source "{}" not supported!'.format(src))
-                return ['-i', src] + set_length(dur, seek, out - seek)
+                return ['-i', src, *set_length(dur, seek, out - seek)]
             else:
                 # FIXME: when list starts with looped clip,
                 # the logo length will be wrong
                 return loop_input(src, dur, out)
         else:
-            return seek_in(seek) + ['-i', src] + set_length(dur, seek, out)
+            return [*seek_in(seek), '-i', src,
+                    *set_length(dur, seek, out)]
     else:
         messenger.error('Clip/URL not exist:\n{}'.format(src))
         return gen_dummy(out - seek)
@@ -824,23 +1357,16 @@ def get_delta(begin):
     """
     current_time = get_time('full_sec')
 
-    if _playlist.length:
-        target_playtime = _playlist.length
-    else:
-        target_playtime = 86400.0
-
-    if _playlist.start >= current_time and not begin == _playlist.start:
-        current_time += target_playtime
+    if _playlist.start >= current_time and begin != _playlist.start:
+        current_time += _playlist.target
 
     current_delta = begin - current_time
 
-    if math.isclose(current_delta, 86400.0, abs_tol=6):
+    if 86394.0 <= current_delta <= 86406.0:
         current_delta -= 86400.0
 
-    ref_time = target_playtime + _playlist.start
-    total_delta = ref_time - begin + current_delta
-
-    return current_delta, total_delta
+    return current_delta, \
+        _playlist.target + _playlist.start - begin + current_delta
 
 
 def handle_list_init(current_delta, total_delta, seek, out):
@@ -925,8 +1451,8 @@ def timed_source(probe, src, begin, dur, seek, out, first, last):
     else:
         if not stdin_args.loop and _playlist.length:
             check_sync(current_delta)
-            messenger.debug('current_delta: {:f}'.format(current_delta))
-            messenger.debug('total_delta: {:f}'.format(total_delta))
+            messenger.debug('current_delta: {:f}', current_delta)
+            messenger.debug('total_delta: {:f}', total_delta)
 
         if (total_delta > out - seek and not last) \
                 or stdin_args.loop or not _playlist.length:
@@ -964,71 +1490,79 @@ def pre_audio_codec():
 # ------------------------------------------------------------------------------
 # building filters,
 # when is needed add individuell filters to match output format
+#
+# resolution, aspect and fps from _pre_comp can not change at runtime,
+# so filters which depend only on them and the source values get cached
 # ------------------------------------------------------------------------------
 
-def deinterlace_filter(probe):
+def deinterlace_filter(field_order):
     """
     when material is interlaced,
     set deinterlacing filter
     """
-    filter_chain = []
-
-    if 'field_order' in probe.video[0] and \
-            probe.video[0]['field_order'] != 'progressive':
-        filter_chain.append('yadif=0:-1:0')
+    if field_order and field_order != 'progressive':
+        return 'yadif=0:-1:0'
 
-    return filter_chain
+    return ''
 
 
-def pad_filter(probe):
+def pad_filter(aspect):
     """
     if source and target aspect is different,
     fix it with pillarbox or letterbox
     """
-    filter_chain = []
-
-    if not math.isclose(probe.video[0]['aspect'],
-                        _pre_comp.aspect, abs_tol=0.03):
-        if probe.video[0]['aspect'] < _pre_comp.aspect:
-            filter_chain.append(
-                'pad=ih*{}/{}/sar:ih:(ow-iw)/2:(oh-ih)/2'.format(_pre_comp.w,
-                                                                 _pre_comp.h))
-        elif probe.video[0]['aspect'] > _pre_comp.aspect:
-            filter_chain.append(
-                'pad=iw:iw*{}/{}/sar:(ow-iw)/2:(oh-ih)/2'.format(_pre_comp.h,
-                                                                 _pre_comp.w))
+    if not math.isclose(aspect, _pre_comp.aspect, abs_tol=0.03):
+        if aspect < _pre_comp.aspect:
+            return 'pad=ih*{}/{}/sar:ih:(ow-iw)/2:(oh-ih)/2'.format(
+                _pre_comp.w, _pre_comp.h)
+        elif aspect > _pre_comp.aspect:
+            return 'pad=iw:iw*{}/{}/sar:(ow-iw)/2:(oh-ih)/2'.format(
+                _pre_comp.h, _pre_comp.w)
 
-    return filter_chain
+    return ''
 
 
-def fps_filter(probe):
+def fps_filter(fps):
     """
     changing frame rate
     """
-    filter_chain = []
-
-    if probe.video[0]['fps'] != _pre_comp.fps:
-        filter_chain.append('framerate=fps={}'.format(_pre_comp.fps))
+    if fps != _pre_comp.fps:
+        return 'framerate=fps={}'.format(_pre_comp.fps)
 
-    return filter_chain
+    return ''
 
 
-def scale_filter(probe):
+def scale_filter(width, height, aspect):
     """
     if target resolution is different to source add scale filter,
     apply also an aspect filter, when is different
     """
     filter_chain = []
 
-    if int(probe.video[0]['width']) != _pre_comp.w or \
-            int(probe.video[0]['height']) != _pre_comp.h:
+    if int(width) != _pre_comp.w or int(height) != _pre_comp.h:
         filter_chain.append('scale={}:{}'.format(_pre_comp.w, _pre_comp.h))
 
-    if not math.isclose(probe.video[0]['aspect'],
-                        _pre_comp.aspect, abs_tol=0.03):
+    if not math.isclose(aspect, _pre_comp.aspect, abs_tol=0.03):
         filter_chain.append('setdar=dar={}'.format(_pre_comp.aspect))
 
-    return filter_chain
+    return ','.join(filter_chain)
+
+
+def join_filters(*filters):
+    """
+    join filter strings to one chain, skip the empty ones
+    """
+    return ','.join(f for f in filters if f)
+
+
+@lru_cache(maxsize=512)
+def format_filter(field_order, width, height, aspect, fps):
+    """
+    all filters to match the output format,
+    cached for every kind of source
+    """
+    return join_filters(deinterlace_filter(field_order), pad_filter(aspect),
+                        fps_filter(fps), scale_filter(width, height, aspect))
 
 
 def fade_filter(duration, seek, out, track=''):
@@ -1044,7 +1578,7 @@ def fade_filter(duration, seek, out, track=''):
         filter_chain.append('{}fade=out:st={}:d=1.0'.format(track,
                                                             out - seek - 1.0))
 
-    return filter_chain
+    return ','.join(filter_chain)
 
 
 def overlay_filter(duration, ad, ad_last, ad_next):
@@ -1056,21 +1590,18 @@ def overlay_filter(duration, ad, ad_last, ad_next):
     logo_filter = '[v]null[logo]'
 
     if _pre_comp.add_logo and os.path.isfile(_pre_comp.logo) and not ad:
-        logo_chain = []
-        opacity = 'format=rgba,colorchannelmixer=aa={}'.format(
-            _pre_comp.opacity)
-        loop = 'loop=loop={}:size=1:start=0'.format(
-                duration * _pre_comp.fps)
-        logo_chain.append('movie={},{},{}'.format(
-                _pre_comp.logo, loop, opacity))
+        logo_chain = [
+            _pre_comp.logo_input,
+            'loop=loop={}:size=1:start=0'.format(duration * _pre_comp.fps),
+            _pre_comp.logo_opacity]
+
         if ad_last:
             logo_chain.append('fade=in:st=0:d=1.0:alpha=1')
         if ad_next:
             logo_chain.append('fade=out:st={}:d=1.0:alpha=1'.format(
                 duration - 1))
 
-        logo_filter = '{}[l];[v][l]{}[logo]'.format(
-            ','.join(logo_chain), _pre_comp.logo_filter)
+        logo_filter = ','.join(logo_chain) + _pre_comp.logo_overlay
 
     return logo_filter
 
@@ -1079,87 +1610,77 @@ def add_audio(probe, duration):
     """
     when clip has no audio we generate an audio line
     """
-    line = []
-
     if not probe.audio:
         messenger.warning('Clip "{}" has no audio!'.format(probe.src))
-        line = [
-            'aevalsrc=0:channel_layout=2:duration={}:sample_rate={}'.format(
-                duration, 48000)]
+        return 'aevalsrc=0:channel_layout=2:duration={}:sample_rate={}'.format(
+            duration, 48000)
 
-    return line
+    return ''
 
 
 def add_loudnorm(probe):
     """
     add single pass loudnorm filter to audio line
     """
-    loud_filter = []
-
     if probe.audio and _pre_comp.add_loudnorm:
-        loud_filter = [('loudnorm=I={}:TP={}:LRA={}').format(
-            _pre_comp.loud_i, _pre_comp.loud_tp, _pre_comp.loud_lra)]
+        return _pre_comp.loudnorm
 
-    return loud_filter
+    return ''
 
 
 def extend_audio(probe, duration):
     """
     check audio duration, is it shorter then clip duration - pad it
     """
-    pad_filter = []
-
     if probe.audio and 'duration' in probe.audio[0] and \
             duration > float(probe.audio[0]['duration']) + 0.3:
-        pad_filter.append('apad=whole_dur={}'.format(duration))
+        return 'apad=whole_dur={}'.format(duration)
 
-    return pad_filter
+    return ''
 
 
 def extend_video(probe, duration, target_duration):
     """
     check video duration, is it shorter then clip duration - pad it
     """
-    pad_filter = []
-
     if 'duration' in probe.video[0] and \
         target_duration < duration > float(
             probe.video[0]['duration']) + 0.3:
-        pad_filter.append('tpad=stop_mode=add:stop_duration={}'.format(
-            duration - float(probe.video[0]['duration'])))
+        return 'tpad=stop_mode=add:stop_duration={}'.format(
+            duration - float(probe.video[0]['duration']))
 
-    return pad_filter
+    return ''
 
 
 def build_filtergraph(duration, seek, out, ad, ad_last, ad_next, probe):
     """
     build final filter graph, with video and audio chain
     """
-    video_chain = []
-    audio_chain = []
+    video_chain = ''
+    audio_chain = ''
     video_map = ['-map', '[logo]']
 
     if out > duration:
         seek = 0
 
     if probe.video[0]:
-        video_chain += deinterlace_filter(probe)
-        video_chain += pad_filter(probe)
-        video_chain += fps_filter(probe)
-        video_chain += scale_filter(probe)
-        video_chain += extend_video(probe, duration, out - seek)
-        video_chain += fade_filter(duration, seek, out)
+        video = probe.video[0]
+        video_chain = join_filters(
+            format_filter(video.get('field_order'), video['width'],
+                          video['height'], video['aspect'], video['fps']),
+            extend_video(probe, duration, out - seek),
+            fade_filter(duration, seek, out))
 
-        audio_chain += add_audio(probe, out - seek)
+        audio_chain = add_audio(probe, out - seek)
 
         if not audio_chain:
-            audio_chain.append('[0:a]anull')
-            audio_chain += add_loudnorm(probe)
-            audio_chain += extend_audio(probe, out - seek)
-            audio_chain += fade_filter(duration, seek, out, 'a')
+            audio_chain = join_filters(
+                '[0:a]anull', add_loudnorm(probe),
+                extend_audio(probe, out - seek),
+                fade_filter(duration, seek, out, 'a'))
 
     if video_chain:
-        video_filter = '{}[v]'.format(','.join(video_chain))
+        video_filter = video_chain + '[v]'
     else:
         video_filter = 'null[v]'
 
@@ -1170,7 +1691,7 @@ def build_filtergraph(duration, seek, out, ad, ad_last, ad_next, probe):
 
     if audio_chain:
         audio_filter = [
-            '-filter_complex', '{}[a]'.format(','.join(audio_chain))]
+            '-filter_complex', audio_chain + '[a]']
         audio_map = ['-map', '[a]']
     else:
         audio_filter = []
@@ -1182,10 +1703,47 @@ def build_filtergraph(duration, seek, out, ad, ad_last, ad_next, probe):
         return video_filter + video_map + ['-map', '1:a']
 
 
+def direct_source(probe, duration, ad):
+    """
+    test if a full length clip is already in pre-compress format
+    and needs no filter, then its streams can be copied without encoding
+    """
+    if probe.is_remote or not probe.format or _pre_comp.add_loudnorm \
+            or probe.format.get('format_name') != 'mpegts' \
+            or len(probe.video) != 1 or len(probe.audio) != 1:
+        return False
+
+    if _pre_comp.add_logo and os.path.isfile(_pre_comp.logo) and not ad:
+        return False
+
+    video = probe.video[0]
+    audio = probe.audio[0]
+
+    if not video or video.get('codec_name') != 'mpeg2video' \
+            or video.get('pix_fmt') != 'yuv420p' or format_filter(
+                video.get('field_order'), video['width'], video['height'],
+                video['aspect'], video['fps']):
+        return False
+
+    return audio.get('codec_name') == 's302m' \
+        and audio.get('sample_rate') == '48000' \
+        and audio.get('channels') == 2 \
+        and not extend_audio(probe, duration)
+
+
 # ------------------------------------------------------------------------------
 # folder watcher
 # ------------------------------------------------------------------------------
 
+def media_pattern():
+    """
+    compiled matcher for file names, from the glob patterns in extensions,
+    used for scanning the folder and for watcher events
+    """
+    return re.compile('|'.join(
+        fnmatch.translate(ext) for ext in _storage.extensions), re.IGNORECASE)
+
+
 class MediaStore:
     """
     fill media list for playing
@@ -1203,24 +1761,54 @@ class MediaStore:
         self.fill()
 
     def fill(self):
-        for ext in _storage.extensions:
-            self.store.extend(
-                glob.glob(os.path.join(self.folder, '**', ext),
-                          recursive=True))
+        # walk folder only once and match all extensions together
+        extensions = media_pattern()
 
-        self.sort()
+        self.store.extend(entry.path for entry in scan_folder(self.folder)
+                          if extensions.match(entry.name))
+
+        # sort list for sorted playing
+        self.store.sort()
 
     def add(self, file):
-        self.store.append(file)
-        self.sort()
+        bisect.insort(self.store, file)
 
     def remove(self, file):
-        self.store.remove(file)
-        self.sort()
+        index = bisect.bisect_left(self.store, file)
 
-    def sort(self):
-        # sort list for sorted playing
-        self.store = sorted(self.store)
+        if index < len(self.store) and self.store[index] == file:
+            del self.store[index]
+
+    def __contains__(self, file):
+        index = bisect.bisect_left(self.store, file)
+
+        return index < len(self.store) and self.store[index] == file
+
+
+def is_network_mount(path):
+    """
+    check if path is on a network share,
+    inotify gets no events there for changes from other clients
+    """
+    path = os.path.realpath(path)
+    mount_point = ''
+    fs_type = ''
+
+    try:
+        with open('/proc/mounts', 'r') as mounts:
+            for line in mounts:
+                fields = line.split()
+                point = fields[1].replace('\\040', ' ')
+
+                if (path == point or path.startswith(
+                        point.rstrip('/') + '/')) \
+                        and len(point) >= len(mount_point):
+                    mount_point = point
+                    fs_type = fields[2]
+    except (OSError, IndexError):
+        return False
+
+    return fs_type in ['nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'fuse.sshfs']
 
 
 class MediaWatcher:
@@ -1228,33 +1816,106 @@ class MediaWatcher:
     watch given folder for file changes and update media list
     """
 
+    # seconds between folder scans on network shares
+    poll_interval = 30
+
     def __init__(self, media):
         self._media = media
+        self.pending = {}
+        self.lock = Lock()
+        self.new_files = Event()
 
-        self.event_handler = PatternMatchingEventHandler(
-            patterns=_storage.extensions)
+        self.pattern = media_pattern()
+
+        self.event_handler = FileSystemEventHandler()
+        self.event_handler.dispatch = self.dispatch
         self.event_handler.on_created = self.on_created
         self.event_handler.on_moved = self.on_moved
         self.event_handler.on_deleted = self.on_deleted
 
-        self.observer = Observer()
+        if is_network_mount(self._media.folder):
+            self.observer = PollingObserver(timeout=self.poll_interval)
+        else:
+            self.observer = Observer()
+
         self.observer.schedule(self.event_handler, self._media.folder,
                                recursive=True)
 
         self.observer.start()
 
-    def on_created(self, event):
-        # add file to media list only if it is completely copied
-        file_size = -1
-        while file_size != os.path.getsize(event.src_path):
-            file_size = os.path.getsize(event.src_path)
+        checker = Thread(name='check_pending', target=self.check_pending)
+        checker.daemon = True
+        checker.start()
+
+    def check_pending(self):
+        """
+        add new files to media list only if they are completely copied,
+        one thread checks all of them, until size and mtime stay unchanged
+        """
+        while True:
+            self.new_files.wait()
             time.sleep(1)
 
-        self._media.add(event.src_path)
+            with self.lock:
+                paths = list(self.pending)
+
+            # stat without holding the lock, so that new events
+            # don't have to wait for slow storage
+            stats = {}
 
-        messenger.info('Add file to media list: "{}"'.format(event.src_path))
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                    stats[path] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    stats[path] = None
+
+            with self.lock:
+                for path in paths:
+                    # file got moved or deleted in the meantime
+                    if path not in self.pending:
+                        continue
+
+                    if stats[path] is None:
+                        del self.pending[path]
+                        continue
+
+                    if stats[path] != self.pending[path]:
+                        self.pending[path] = stats[path]
+                        continue
+
+                    del self.pending[path]
+                    self._media.add(path)
+
+                    messenger.info(
+                        'Add file to media list: "{}"'.format(path))
+
+                if not self.pending:
+                    self.new_files.clear()
+
+    def dispatch(self, event):
+        # pass only events from media files on
+        for path in (event.src_path, getattr(event, 'dest_path', None)):
+            if path and self.pattern.match(os.path.basename(path)):
+                FileSystemEventHandler.dispatch(self.event_handler, event)
+                return
+
+    def on_created(self, event):
+        with self.lock:
+            self.pending[event.src_path] = None
+
+        self.new_files.set()
 
     def on_moved(self, event):
+        with self.lock:
+            if event.src_path in self.pending:
+                # file is still copying, check it under the new name
+                del self.pending[event.src_path]
+                self.pending[event.dest_path] = None
+                self.new_files.set()
+
+                return
+
         self._media.remove(event.src_path)
         self._media.add(event.dest_path)
 
@@ -1262,6 +1923,9 @@ class MediaWatcher:
                                                             event.dest_path))
 
     def on_deleted(self, event):
+        with self.lock:
+            self.pending.pop(event.src_path, None)
+
         self._media.remove(event.src_path)
 
         messenger.info(
@@ -1280,21 +1944,27 @@ class GetSourceFromFolder:
     def __init__(self, media):
         self._media = media
 
-        self.last_played = []
+        self.bag = []
         self.index = 0
         self.probe = MediaProbe()
+        self.direct = False
 
     def next(self):
         while True:
             if _storage.shuffle:
-                clip = random.choice(self._media.store)
+                # shuffle-bag: every clip plays once, before one repeats
+                if not self.bag:
+                    self.bag = list(self._media.store)
+                    random.shuffle(self.bag)
 
-                if len(self.last_played) > len(self._media.store) / 2:
-                    self.last_played.pop(0)
+                clip = self.bag.pop()
 
-                if clip not in self.last_played:
-                    self.last_played.append(clip)
+                # skip clips which got removed in the meantime
+                if clip in self._media:
                     self.probe.load(clip)
+                    self.direct = direct_source(
+                        self.probe, float(self.probe.format['duration']),
+                        False)
                     filtergraph = build_filtergraph(
                         float(self.probe.format['duration']), 0.0,
                         float(self.probe.format['duration']), False, False,
@@ -1305,6 +1975,9 @@ class GetSourceFromFolder:
             else:
                 while self.index < len(self._media.store):
                     self.probe.load(self._media.store[self.index])
+                    self.direct = direct_source(
+                        self.probe, float(self.probe.format['duration']),
+                        False)
                     filtergraph = build_filtergraph(
                         float(self.probe.format['duration']), 0.0,
                         float(self.probe.format['duration']), False, False,
@@ -1332,21 +2005,23 @@ class GetSourceFromPlaylist:
     def __init__(self):
         self.init_time = _playlist.start
         self.last_time = get_time('full_sec')
-
-        if _playlist.length:
-            self.total_playtime = _playlist.length
-        else:
-            self.total_playtime = 86400.0
+        self.total_playtime = _playlist.target
 
         if self.last_time < _playlist.start:
             self.last_time += self.total_playtime
 
         self.last_mod_time = 0.0
+        self.last_mod_header = None
         self.json_file = None
-        self.clip_nodes = None
+        self.clips = None
+        self.begins = None
+        self.begins_clips = None
         self.src_cmd = None
         self.probe = MediaProbe()
+        self.prefetch = ThreadPoolExecutor(max_workers=1)
+        self.prefetched = None
         self.filtergraph = []
+        self.direct = False
         self.first = True
         self.last = False
         self.list_date = get_date(True)
@@ -1372,8 +2047,14 @@ class GetSourceFromPlaylist:
         if '://' in self.json_file:
             self.json_file = self.json_file.replace('\\', '/')
 
+            json_req = request.Request(self.json_file)
+
+            # let the server answer with 304, when playlist is unchanged
+            if self.last_mod_time and self.last_mod_header:
+                json_req.add_header('If-Modified-Since', self.last_mod_header)
+
             try:
-                req = request.urlopen(self.json_file,
+                req = request.urlopen(json_req,
                                       timeout=1,
                                       context=ssl._create_unverified_context())
                 b_time = req.headers['last-modified']
@@ -1381,10 +2062,15 @@ class GetSourceFromPlaylist:
                 mod_time = time.mktime(temp_time)
 
                 if mod_time > self.last_mod_time:
-                    self.clip_nodes = valid_json(req)
+                    clip_nodes = valid_json(req)
+                    self.clips = playlist_clips(clip_nodes)
                     self.last_mod_time = mod_time
+                    self.last_mod_header = b_time
                     messenger.info('Open: ' + self.json_file)
-                    validate_thread(self.clip_nodes)
+                    validate_thread(clip_nodes)
+            except request.HTTPError as err:
+                if err.code != 304:
+                    self.eof_handling('Get playlist from url failed!', False)
             except (request.URLError, socket.timeout):
                 self.eof_handling('Get playlist from url failed!', False)
 
@@ -1393,32 +2079,35 @@ class GetSourceFromPlaylist:
             mod_time = os.path.getmtime(self.json_file)
             if mod_time > self.last_mod_time:
                 with open(self.json_file, 'r', encoding='utf-8') as f:
-                    self.clip_nodes = valid_json(f)
+                    clip_nodes = valid_json(f)
 
+                self.clips = playlist_clips(clip_nodes)
                 self.last_mod_time = mod_time
                 messenger.info('Open: ' + self.json_file)
-                validate_thread(self.clip_nodes)
+                validate_thread(clip_nodes)
         else:
             # when we have no playlist for the current day,
             # then we generate a black clip
             # and calculate the seek in time, for when the playlist comes back
             self.eof_handling('Playlist not exist:', False)
 
-    def get_clip_in_out(self, node):
-        if is_float(node["in"]):
-            self.seek = node["in"]
-        else:
-            self.seek = 0
+    def clip_begins(self):
+        """
+        begin time from every clip, plus end time from the last one,
+        recalculate only when playlist or start time has changed
+        """
+        if self.begins_clips is not self.clips or \
+                self.begins[0] != self.init_time:
+            self.begins = list(accumulate(
+                [self.init_time] + [c.out - c.seek for c in self.clips]))
+            self.begins_clips = self.clips
 
-        if is_float(node["duration"]):
-            self.duration = node["duration"]
-        else:
-            self.duration = 20
+        return self.begins
 
-        if is_float(node["out"]):
-            self.out = node["out"]
-        else:
-            self.out = self.duration
+    def get_clip_in_out(self, clip):
+        self.seek = clip.seek
+        self.duration = clip.duration
+        self.out = clip.out
 
     def get_input(self):
         self.src_cmd, self.seek, self.out, self.next_playlist = timed_source(
@@ -1426,21 +2115,19 @@ class GetSourceFromPlaylist:
             self.seek, self.out, self.first, self.last
         )
 
-    def get_category(self, index, node):
-        if 'category' in node:
+    def get_category(self, index, clip):
+        if clip.category is not None:
             if index - 1 >= 0:
-                last_category = self.clip_nodes[
-                    "program"][index - 1]["category"]
+                last_category = self.clips[index - 1].category
             else:
                 last_category = 'noad'
 
-            if index + 2 <= len(self.clip_nodes["program"]):
-                next_category = self.clip_nodes[
-                    "program"][index + 1]["category"]
+            if index + 2 <= len(self.clips):
+                next_category = self.clips[index + 1].category
             else:
                 next_category = 'noad'
 
-            if node["category"] == 'advertisement':
+            if clip.category == 'advertisement':
                 self.ad = True
             else:
                 self.ad = False
@@ -1487,6 +2174,8 @@ class GetSourceFromPlaylist:
         self.first = False
         self.last_time = 0.0
 
+        self.direct = False
+
         if self.duration > 2 and fill:
             self.probe, self.src_cmd = gen_filler(self.duration)
             self.set_filtergraph()
@@ -1503,49 +2192,75 @@ class GetSourceFromPlaylist:
 
         self.last = False
 
-    def peperation_task(self, index, node):
+    def prefetch_next(self, index):
+        # probe next clip in background, while the current one is playing,
+        # the result ends up in the probe cache, errors get reported
+        # when the clip is loaded for playing
+        if index + 1 < len(self.clips):
+            source = self.clips[index + 1].source
+
+            if source and \
+                    source.split('://', 1)[0] not in MediaProbe.remote_source:
+                self.prefetched = self.prefetch.submit(MediaProbe().load,
+                                                       source, True)
+
+    def peperation_task(self, index, clip):
         # call functions in order to prepare source and filter
-        self.src = node["source"]
+        self.src = clip.source
+
+        # don't probe the same file twice at the same time
+        if self.prefetched is not None:
+            self.prefetched.result()
+            self.prefetched = None
+
         self.probe.load(self.src)
+        self.prefetch_next(index)
 
         self.get_input()
-        self.get_category(index, node)
+        self.get_category(index, clip)
         self.set_filtergraph()
         self.check_for_next_playlist()
 
+        # untrimmed clip, without seek, cut or loop
+        self.direct = self.src_cmd == ['-i', self.src] and \
+            direct_source(self.probe, self.duration, self.ad)
+
     def next(self):
         while True:
             self.get_playlist()
 
-            if self.clip_nodes is None:
+            if self.clips is None:
                 self.set_filtergraph()
                 yield self.src_cmd + self.filtergraph
                 continue
 
-            self.begin = self.init_time
+            begins = self.clip_begins()
+            count = len(self.clips)
 
-            # loop through all clips in playlist and get correct clip in time
-            for index, node in enumerate(self.clip_nodes["program"]):
-                self.get_clip_in_out(node)
+            # search correct clip in time, with binary search in begin times
+            if self.first:
+                # first time we end up here, take clip which is running now
+                index = bisect.bisect_right(begins, self.last_time, 1) - 1
+            else:
+                index = bisect.bisect_right(begins, self.last_time, 0, count)
 
-                # first time we end up here
-                if self.first and \
-                        self.last_time < self.begin + self.out - self.seek:
+            if index < count:
+                clip = self.clips[index]
+                self.get_clip_in_out(clip)
+                self.begin = begins[index]
 
-                    self.peperation_task(index, node)
+                if self.first:
                     self.first = False
-                    break
-                elif self.last_time < self.begin:
-                    if index + 1 == len(self.clip_nodes["program"]):
-                        self.last = True
-                    else:
-                        self.last = False
-
-                    self.peperation_task(index, node)
-                    break
+                else:
+                    self.last = index + 1 == count
 
-                self.begin += self.out - self.seek
+                self.peperation_task(index, clip)
             else:
+                if count:
+                    self.get_clip_in_out(self.clips[-1])
+
+                self.begin = begins[count]
+
                 if stdin_args.loop:
                     self.check_for_next_playlist()
                     self.init_time = self.last_time + 1
@@ -1573,14 +2288,19 @@ def main():
     year = get_date(False).split('-')[0]
     overlay = []
 
-    ff_pre_settings = [
+    # decoder arguments are the same for every clip, only the input changes
+    ff_pre_cmd = ('ffmpeg', '-v', _log.ff_level.lower(), '-hide_banner',
+                  '-nostats')
+    ff_pre_settings = (
         '-pix_fmt', 'yuv420p', '-r', str(_pre_comp.fps),
         '-c:v', 'mpeg2video', '-intra',
         '-b:v', '{}k'.format(_pre_comp.v_bitrate),
         '-minrate', '{}k'.format(_pre_comp.v_bitrate),
         '-maxrate', '{}k'.format(_pre_comp.v_bitrate),
-        '-bufsize', '{}k'.format(_pre_comp.v_bufsize)
-        ] + pre_audio_codec() + ['-f', 'mpegts', '-']
+        '-bufsize', '{}k'.format(_pre_comp.v_bufsize),
+        *pre_audio_codec(), '-f', 'mpegts', '-')
+    ff_copy = ('-map', '0:v:0', '-map', '0:a:0', '-c', 'copy',
+               '-f', 'mpegts', '-')
 
     if _text.add_text and os.path.isfile(_text.textfile):
         messenger.info('Overlay text file: "{}"'.format(_text.textfile))
@@ -1593,12 +2313,16 @@ def main():
                         _text.textfile, _text.x, _text.y)
         ]
 
+    # all decoders write direct into this pipe, which the encoder reads,
+    # so the stream data don't need to go through python
+    pipe_read, pipe_write = os.pipe()
+
     try:
         if _playout.preview or stdin_args.desktop:
             # preview playout to player
             _ff.encoder = Popen([
                 'ffplay', '-hide_banner', '-nostats', '-i', 'pipe:0'
-                ] + overlay, stderr=PIPE, stdin=PIPE, stdout=None)
+                ] + overlay, stderr=PIPE, stdin=pipe_read, stdout=None)
         else:
             _ff.encoder = Popen([
                 'ffmpeg', '-v', _log.ff_level.lower(), '-hide_banner',
@@ -1609,13 +2333,15 @@ def main():
                     '-metadata', 'service_provider=' + _playout.provider,
                     '-metadata', 'year={}'.format(year)
                 ] + _playout.post_comp_extra + [_playout.out_addr],
-                stdin=PIPE, stderr=PIPE)
+                stdin=pipe_read, stderr=PIPE)
+
+        _ff.enc_alive = True
 
-        enc_err_thread = Thread(target=ffmpeg_stderr_reader,
-                                args=(_ff.encoder.stderr, encoder_logger,
-                                      ENC_PREFIX))
-        enc_err_thread.daemon = True
-        enc_err_thread.start()
+        # only the encoder reads, decoders get a broken pipe when it stops
+        os.close(pipe_read)
+
+        stderr_reader = StderrReader()
+        stderr_reader.add(_ff.encoder.stderr, encoder_logger, ENC_PREFIX)
 
         if _playlist.mode and not stdin_args.folder:
             watcher = None
@@ -1628,7 +2354,7 @@ def main():
 
         try:
             for src_cmd in get_source.next():
-                messenger.debug('src_cmd: "{}"'.format(src_cmd))
+                messenger.debug('src_cmd: "{}"', src_cmd)
                 if src_cmd[0] == '-i':
                     current_file = src_cmd[1]
                 else:
@@ -1636,27 +2362,35 @@ def main():
 
                 messenger.info('Play: "{}"'.format(current_file))
 
-                with Popen([
-                    'ffmpeg', '-v', _log.ff_level.lower(), '-hide_banner',
-                    '-nostats'] + src_cmd + ff_pre_settings,
-                        stdout=PIPE, stderr=PIPE) as _ff.decoder:
-
-                    dec_err_thread = Thread(target=ffmpeg_stderr_reader,
-                                            args=(_ff.decoder.stderr,
-                                                  decoder_logger,
-                                                  DEC_PREFIX))
-                    dec_err_thread.daemon = True
-                    dec_err_thread.start()
-
-                    while True:
-                        buf = _ff.decoder.stdout.read(COPY_BUFSIZE)
-                        if not buf:
-                            break
-                        _ff.encoder.stdin.write(buf)
-
-        except BrokenPipeError:
-            messenger.error('Broken Pipe!')
-            terminate_processes(watcher)
+                if get_source.direct:
+                    # clip is already in the right format, copy only
+                    # video and audio, remuxing gives the same ts layout
+                    # and timestamps as the encoded clips
+                    dec_cmd = [*ff_pre_cmd, '-i', current_file, *ff_copy]
+                else:
+                    dec_cmd = [*ff_pre_cmd, *src_cmd, *ff_pre_settings]
+
+                with Popen(dec_cmd, stdout=pipe_write,
+                           stderr=PIPE) as _ff.decoder:
+                    _ff.dec_alive = True
+
+                    stderr_reader.add(_ff.decoder.stderr, decoder_logger,
+                                      DEC_PREFIX)
+
+                    try:
+                        _ff.decoder.wait()
+                    except BaseException:
+                        # the encoder still reads from the pipe,
+                        # so stop decoder before Popen waits for it
+                        _ff.decoder.terminate()
+                        raise
+
+                _ff.dec_alive = False
+
+                if _ff.encoder.poll() is not None:
+                    messenger.error('Broken Pipe!')
+                    terminate_processes(watcher)
+                    break
 
         except SystemExit:
             messenger.info('Got close command')
@@ -1667,11 +2401,12 @@ def main():
             terminate_processes(watcher)
 
         # close encoder when nothing is to do anymore
-        if _ff.encoder.poll() is None:
-            _ff.encoder.terminate()
+        terminate_processes()
 
     finally:
+        os.close(pipe_write)
         _ff.encoder.wait()
+        _ff.enc_alive = False
 
 
 if __name__ == '__main__':